@@ -9,6 +9,12 @@
 #   ./build.sh x86   (Builds x86 only)
 #   ./build.sh x64   (Builds x64 only)
 #   ./build.sh arm64 (Builds ARM64 only)
+#
+#   WGET_BUILD_STAGE=gnutls ./build.sh x64  (Builds a single stage of $BUILD_STAGES)
+#   WGET_BUILD_FORCE=1                      (Rebuilds libraries that are already installed)
+#   CORE=4                                  (make -j, defaults to nproc)
+#
+# build_driver.py runs these stages concurrently along their dependencies.
 
 # -----------------------------------------------------------------------------
 # Version & URL Definitions (Centralized Management)
@@ -60,6 +66,9 @@ WGET_URL="https://ftp.gnu.org/gnu/wget/wget-${WGET_VER}.tar.gz"
 
 LLVM_MINGW_URL="https://github.com/mstorsjo/llvm-mingw/releases/download/20251216/llvm-mingw-20251216-ucrt-ubuntu-22.04-x86_64.tar.xz"
 
+# Build order; build_driver.py mirrors it as a dependency graph
+BUILD_STAGES="fetch gmp nettle tasn1 idn2 unistring zlib gnutls cares iconv psl pcre2 gpg-error gettext openssl wget-gnutls wget-openssl"
+
 # -----------------------------------------------------------------------------
 # Entry Point
 # -----------------------------------------------------------------------------
@@ -72,6 +81,11 @@ if [ -z "$BUILD_ARCH_TYPE" ]; then
   BUILD_ARCH_TYPE="both"
 fi
 
+if [ -n "$WGET_BUILD_STAGE" ] && [[ " $BUILD_STAGES " != *" $WGET_BUILD_STAGE "* ]]; then
+  echo "Unknown stage: $WGET_BUILD_STAGE (stages: $BUILD_STAGES)"
+  exit 1
+fi
+
 if [ "$BUILD_ARCH_TYPE" == "both" ]; then
   echo "================================================================="
   echo "ENACTING DUAL-ARCHITECHTURE BUILD"
@@ -212,7 +226,7 @@ NANOSLEEP_OVERRIDES=(
   gl_cv_func_nanosleep=yes
 )
 
-export CORE=$(nproc)
+export CORE=${CORE:-$(nproc)}
 
 set -e
 
@@ -243,13 +257,43 @@ fetch_src() {
     fi
 }
 
+# True when stage $1 is selected (every stage unless WGET_BUILD_STAGE is set)
+# and has to be built: its library $2 is missing or WGET_BUILD_FORCE is set
+run_stage() {
+    if [ -n "$WGET_BUILD_STAGE" ] && [ "$WGET_BUILD_STAGE" != "$1" ]; then
+        return 1
+    fi
+    [ -n "$WGET_BUILD_FORCE" ] || [ -z "$2" ] || [ ! -f "$2" ]
+}
+
+# Stages of different libraries may install into the prefix at the same time
+locked() {
+    if command -v flock > /dev/null; then
+        flock "$INSTALL_PATH/.install.lock" "$@"
+    else
+        "$@"
+    fi
+}
+
 cd $WORK_DIR
 
+# -----------------------------------------------------------------------------
+# Download all sources up front
+# -----------------------------------------------------------------------------
+if run_stage fetch; then
+  for url in "$GMP_URL" "$NETTLE_URL" "$TASN1_URL" "$IDN2_URL" "$UNISTRING_URL" "$ZLIB_URL" \
+             "$GNUTLS_URL" "$CARES_URL" "$ICONV_URL" "$PSL_URL" "$PCRE2_URL" "$GPG_ERROR_URL" \
+             "$GETTEXT_URL" "$OPENSSL_URL" "$WGET_URL"; do
+    fetch_src "$url"
+  done
+fi
+
 # -----------------------------------------------------------------------------
 # Build gmp (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libgmp.a ]; then
+if run_stage gmp "$INSTALL_PATH"/lib/libgmp.a; then
   fetch_src "$GMP_URL"
+  rm -rf "gmp-${GMP_VER}"
   tar -xf "$DOWNLOAD_DIR/gmp-${GMP_VER}.tar.xz"
   cd gmp-${GMP_VER}
   CFLAGS="$GMP_CFLAGS" \
@@ -261,14 +305,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libgmp.a ]; then
    CC_FOR_BUILD=gcc \
   || abort "[gmp] configure failed"
   make -j $CORE || abort "[gmp] make failed"
-  make install || abort "[gmp] make install"
+  locked make install || abort "[gmp] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build nettle (Requires GMP)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libnettle.a ]; then
+if run_stage nettle "$INSTALL_PATH"/lib/libnettle.a; then
   fetch_src "$NETTLE_URL"
+  rm -rf "nettle-${NETTLE_VER}"
   tar -xf "$DOWNLOAD_DIR/nettle-${NETTLE_VER}.tar.gz"
   cd nettle-${NETTLE_VER}
   CFLAGS="-I$INSTALL_PATH/include" \
@@ -280,14 +325,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libnettle.a ]; then
   --prefix="$INSTALL_PATH" \
   || abort "[nettle] configure failed"
   make -j $CORE || abort "[nettle] make failed"
-  make install || abort "[nettle] make install"
+  locked make install || abort "[nettle] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build tasn (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libtasn1.a ]; then
+if run_stage tasn1 "$INSTALL_PATH"/lib/libtasn1.a; then
   fetch_src "$TASN1_URL"
+  rm -rf "libtasn1-${TASN1_VER}"
   tar -xf "$DOWNLOAD_DIR/libtasn1-${TASN1_VER}.tar.gz"
   cd libtasn1-${TASN1_VER}
   ./configure \
@@ -297,14 +343,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libtasn1.a ]; then
    --prefix="$INSTALL_PATH" \
   || abort "[tasn] configure failed"
   make -j $CORE || abort "[tasn] make failed"
-  make install || abort "[tasn] make install"
+  locked make install || abort "[tasn] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build idn2 (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libidn2.a ]; then
+if run_stage idn2 "$INSTALL_PATH"/lib/libidn2.a; then
   fetch_src "$IDN2_URL"
+  rm -rf "libidn2-${IDN2_VER}"
   tar -xf "$DOWNLOAD_DIR/libidn2-${IDN2_VER}.tar.gz"
   cd libidn2-${IDN2_VER}
   ./configure \
@@ -312,16 +359,20 @@ if [ ! -f "$INSTALL_PATH"/lib/libidn2.a ]; then
   --disable-shared \
   --disable-doc \
   --prefix="$INSTALL_PATH" \
+  --with-included-libunistring \
+  --without-libiconv-prefix \
+  --without-libintl-prefix \
   || abort "[idn2] configure failed"
   make -j $CORE || abort "[idn2] make failed"
-  make install || abort "[idn2] make install"
+  locked make install || abort "[idn2] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build unistring (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libunistring.a ]; then
+if run_stage unistring "$INSTALL_PATH"/lib/libunistring.a; then
   fetch_src "$UNISTRING_URL"
+  rm -rf "libunistring-${UNISTRING_VER}"
   tar -xf "$DOWNLOAD_DIR/libunistring-${UNISTRING_VER}.tar.gz"
   cd libunistring-${UNISTRING_VER}
   env "${NANOSLEEP_OVERRIDES[@]}" \
@@ -329,16 +380,18 @@ if [ ! -f "$INSTALL_PATH"/lib/libunistring.a ]; then
   --host=$WGET_MINGW_HOST \
   --disable-shared \
   --prefix="$INSTALL_PATH" \
+  --without-libiconv-prefix \
   || abort "[unistring] configure failed"
   make -j $CORE || abort "[unistring] make failed"
-  make install || abort "[unistring] make install"
+  locked make install || abort "[unistring] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build zlib (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libz.a ]; then
+if run_stage zlib "$INSTALL_PATH"/lib/libz.a; then
   fetch_src "$ZLIB_URL"
+  rm -rf "zlib-${ZLIB_VER}"
   tar -xf "$DOWNLOAD_DIR/zlib-${ZLIB_VER}.tar.gz"
   cd zlib-${ZLIB_VER}
   env $ZLIB_CONFIG_ENV  \
@@ -347,14 +400,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libz.a ]; then
   --prefix="$INSTALL_PATH" \
   || abort "[zlib] configure failed"
   make -j $CORE || abort "[zlib] make failed"
-  make install || abort "[zlib] make install"
+  locked make install || abort "[zlib] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build gnutls (Requires GMP, nettle, tasn1, idn2, zlib (arm64))
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libgnutls.a ]; then
+if run_stage gnutls "$INSTALL_PATH"/lib/libgnutls.a; then
   fetch_src "$GNUTLS_URL"
+  rm -rf "gnutls-${GNUTLS_VER}"
   tar -xf "$DOWNLOAD_DIR/gnutls-${GNUTLS_VER}.tar.xz"
   cd gnutls-${GNUTLS_VER}
   env "${NANOSLEEP_OVERRIDES[@]}" \
@@ -383,16 +437,19 @@ if [ ! -f "$INSTALL_PATH"/lib/libgnutls.a ]; then
   --disable-shared \
   --enable-static \
   --without-zstd \
+  --without-libiconv-prefix \
+  --without-libintl-prefix \
   || abort "[gnutls] configure failed"
   make -j $CORE || abort "[gnutls] make failed"
-  make install || abort "[gnutls] make install"
+  locked make install || abort "[gnutls] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build cares (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libcares.a ]; then
+if run_stage cares "$INSTALL_PATH"/lib/libcares.a; then
   fetch_src "$CARES_URL"
+  rm -rf "c-ares-${CARES_VER}"
   tar -xf "$DOWNLOAD_DIR/c-ares-${CARES_VER}.tar.gz"
   cd c-ares-${CARES_VER}
   CPPFLAGS="-DCARES_STATICLIB=1" \
@@ -405,14 +462,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libcares.a ]; then
   --disable-debug \
   || abort "[cares] configure failed"
   make -j $CORE || abort "[cares] make failed"
-  make install || abort "[cares] make install"
+  locked make install || abort "[cares] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build iconv (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libiconv.a ]; then
+if run_stage iconv "$INSTALL_PATH"/lib/libiconv.a; then
   fetch_src "$ICONV_URL"
+  rm -rf "libiconv-${ICONV_VER}"
   tar -xf "$DOWNLOAD_DIR/libiconv-${ICONV_VER}.tar.gz"
   cd libiconv-${ICONV_VER}
   ./configure \
@@ -422,14 +480,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libiconv.a ]; then
   --enable-static \
   || abort "[iconv] configure failed"
   make -j $CORE || abort "[iconv] make failed"
-  make install || abort "[iconv] make install"
+  locked make install || abort "[iconv] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build psl (Requires idn2, unistring, iconv)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libpsl.a ]; then
+if run_stage psl "$INSTALL_PATH"/lib/libpsl.a; then
   fetch_src "$PSL_URL"
+  rm -rf "libpsl-${PSL_VER}"
   tar -xf "$DOWNLOAD_DIR/libpsl-${PSL_VER}.tar.gz"
   cd libpsl-${PSL_VER}
   CFLAGS="-I$INSTALL_PATH/include" \
@@ -447,14 +506,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libpsl.a ]; then
   --with-libiconv-prefix="$INSTALL_PATH" \
   || abort "[psl] configure failed"
   make -j $CORE  || abort "[psl] make failed"
-  make install || abort "[psl] make install"
+  locked make install || abort "[psl] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build pcre2 (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libpcre2-8.a ]; then
+if run_stage pcre2 "$INSTALL_PATH"/lib/libpcre2-8.a; then
   fetch_src "$PCRE2_URL"
+  rm -rf "pcre2-${PCRE2_VER}"
   tar -xf "$DOWNLOAD_DIR/pcre2-${PCRE2_VER}.tar.gz"
   cd pcre2-${PCRE2_VER}
   ./configure \
@@ -464,14 +524,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libpcre2-8.a ]; then
   --enable-static \
   || abort "[pcre2] configure failed"
   make -j $CORE || abort "[pcre2] make failed"
-  make install || abort "[pcre2] make install"
+  locked make install || abort "[pcre2] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build gpg-error (No dependencies)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libgpg-error.a ]; then
+if run_stage gpg-error "$INSTALL_PATH"/lib/libgpg-error.a; then
   fetch_src "$GPG_ERROR_URL"
+  rm -rf "libgpg-error-${GPG_ERROR_VER}"
   tar -xf "$DOWNLOAD_DIR/libgpg-error-${GPG_ERROR_VER}.tar.bz2"
   cd libgpg-error-${GPG_ERROR_VER}
   ./configure \
@@ -480,16 +541,18 @@ if [ ! -f "$INSTALL_PATH"/lib/libgpg-error.a ]; then
   --prefix="$INSTALL_PATH" \
   --enable-static \
   --disable-doc \
+  --without-libintl-prefix \
   || abort "[gpg-error] configure failed"
   make -j $CORE || abort "[gpg-error] make failed"
-  make install || abort "[gpg-error] make install"
+  locked make install || abort "[gpg-error] make install"
   cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build gettext (provides libintl for NLS, requires iconv)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH"/lib/libintl.a ]; then
+if run_stage gettext "$INSTALL_PATH"/lib/libintl.a; then
   fetch_src "$GETTEXT_URL"
+  rm -rf "gettext-${GETTEXT_VER}"
   tar -xf "$DOWNLOAD_DIR/gettext-${GETTEXT_VER}.tar.gz"
   cd gettext-${GETTEXT_VER}/gettext-runtime
   ./configure \
@@ -507,14 +570,15 @@ if [ ! -f "$INSTALL_PATH"/lib/libintl.a ]; then
   --enable-relocatable \
   || abort "[gettext-runtime] configure failed"
   make -j $CORE || abort "[gettext-runtime] make failed"
-  make install || abort "[gettext-runtime] make install"
+  locked make install || abort "[gettext-runtime] make install"
   cd ../..
 fi
 # -----------------------------------------------------------------------------
 # Build openssl (Requires zlib)
 # -----------------------------------------------------------------------------
-if [ ! -f "$INSTALL_PATH/$OPENSSL_LIB_DIR/libssl.a" ]; then
+if run_stage openssl "$INSTALL_PATH/$OPENSSL_LIB_DIR/libssl.a"; then
   fetch_src "$OPENSSL_URL"
+  rm -rf "openssl-${OPENSSL_VER}"
   tar -xf "$DOWNLOAD_DIR/openssl-${OPENSSL_VER}.tar.gz"
   cd openssl-${OPENSSL_VER}
   CPPFLAGS="-I$INSTALL_PATH/include" \
@@ -531,93 +595,100 @@ if [ ! -f "$INSTALL_PATH/$OPENSSL_LIB_DIR/libssl.a" ]; then
   zlib \
   || abort "[openssl] configure failed"
  make ${OPENSSL_MAKE_OVERRIDE:+"$OPENSSL_MAKE_OVERRIDE"} -j $CORE || abort "[openssl] make failed"
- make install_sw || abort "[openssl] make install_sw"
+ locked make install_sw || abort "[openssl] make install_sw"
  cd ..
 fi
 # -----------------------------------------------------------------------------
 # Build wget (gnuTLS)
 # -----------------------------------------------------------------------------
-fetch_src "$WGET_URL"
-rm -rf "wget-${WGET_VER}"
-tar -xf "$DOWNLOAD_DIR/wget-${WGET_VER}.tar.gz"
-cd "wget-${WGET_VER}"
-# Force fcntl to 'no' because MinGW headers lack POSIX constants like F_SETFD,
-# causing Gnulib's replacement wrapper (rpl_fcntl) to fail during compilation.
-CFLAGS="-I$INSTALL_PATH/include -DGNUTLS_INTERNAL_BUILD=1 -DCARES_STATICLIB=1 -DPCRE2_STATIC=1 -DNDEBUG -O2 -march=$WGET_ARCH -mtune=generic $WGET_CFLAGS" \
- LDFLAGS="-L$INSTALL_PATH/lib -static -static-libgcc" \
- CPPFLAGS="-DSYSTEM_WGETRC='\"C:/ProgramData/wget/etc/wgetrc\"' -DLOCALEDIR='\"C:/ProgramData/wget/share/locale\"'" \
- GNUTLS_CFLAGS=$CFLAGS \
- GNUTLS_LIBS="-L$INSTALL_PATH/lib -lgnutls -lbcrypt -lncrypt" \
- LIBPSL_CFLAGS=$CFLAGS \
- LIBPSL_LIBS="-L$INSTALL_PATH/lib -lpsl" \
- CARES_CFLAGS=$CFLAGS \
- CARES_LIBS="-L$INSTALL_PATH/lib -lcares" \
- PCRE2_CFLAGS=$CFLAGS \
- PCRE2_LIBS="-L$INSTALL_PATH/lib -lpcre2-8"  \
- LIBS="-L$INSTALL_PATH/lib -lpsl -lhogweed -lnettle -lgnutls -lgmp -ltasn1 -lidn2 -lcares -lunistring -lpcre2-8 -lgpg-error -liconv -lintl -lz -lws2_32 -lbcrypt -lcrypt32 -liphlpapi -lpthread" \
- ./configure \
- --host=$WGET_MINGW_HOST \
- --prefix="$INSTALL_PATH" \
- --disable-debug \
- --disable-valgrind-tests \
- --enable-iri \
- --enable-pcre2 \
- --with-ssl=gnutls \
- --with-included-libunistring \
- --with-libidn \
- --with-cares \
- --with-libpsl \
-  ac_cv_func_fcntl=no \
- $WGET_OVERRIDE \
-|| abort "[wget gnutls] configure failed"
-make -j $CORE || abort "[wget gnutls] make failed"
-make install || abort "[wget gnutls] make install"
-mkdir -p "$INSTALL_PATH"/wget-gnutls
-cp "$INSTALL_PATH"/bin/wget.exe "$INSTALL_PATH"/wget-gnutls/wget-gnutls$EXE_SUFFIX
-$MINGW_STRIP_TOOL "$INSTALL_PATH"/wget-gnutls/wget-gnutls$EXE_SUFFIX
+if run_stage wget-gnutls; then
+  fetch_src "$WGET_URL"
+  rm -rf wget-gnutls && mkdir wget-gnutls
+  tar -xf "$DOWNLOAD_DIR/wget-${WGET_VER}.tar.gz" -C wget-gnutls
+  cd "wget-gnutls/wget-${WGET_VER}"
+  # Force fcntl to 'no' because MinGW headers lack POSIX constants like F_SETFD,
+  # causing Gnulib's replacement wrapper (rpl_fcntl) to fail during compilation.
+  CFLAGS="-I$INSTALL_PATH/include -DGNUTLS_INTERNAL_BUILD=1 -DCARES_STATICLIB=1 -DPCRE2_STATIC=1 -DNDEBUG -O2 -march=$WGET_ARCH -mtune=generic $WGET_CFLAGS" \
+   LDFLAGS="-L$INSTALL_PATH/lib -static -static-libgcc" \
+   CPPFLAGS="-DSYSTEM_WGETRC='\"C:/ProgramData/wget/etc/wgetrc\"' -DLOCALEDIR='\"C:/ProgramData/wget/share/locale\"'" \
+   GNUTLS_CFLAGS=$CFLAGS \
+   GNUTLS_LIBS="-L$INSTALL_PATH/lib -lgnutls -lbcrypt -lncrypt" \
+   LIBPSL_CFLAGS=$CFLAGS \
+   LIBPSL_LIBS="-L$INSTALL_PATH/lib -lpsl" \
+   CARES_CFLAGS=$CFLAGS \
+   CARES_LIBS="-L$INSTALL_PATH/lib -lcares" \
+   PCRE2_CFLAGS=$CFLAGS \
+   PCRE2_LIBS="-L$INSTALL_PATH/lib -lpcre2-8"  \
+   LIBS="-L$INSTALL_PATH/lib -lpsl -lhogweed -lnettle -lgnutls -lgmp -ltasn1 -lidn2 -lcares -lunistring -lpcre2-8 -lgpg-error -liconv -lintl -lz -lws2_32 -lbcrypt -lcrypt32 -liphlpapi -lpthread" \
+   ./configure \
+   --host=$WGET_MINGW_HOST \
+   --prefix="$INSTALL_PATH" \
+   --disable-debug \
+   --disable-valgrind-tests \
+   --enable-iri \
+   --enable-pcre2 \
+   --with-ssl=gnutls \
+   --with-included-libunistring \
+   --with-libidn \
+   --with-cares \
+   --with-libpsl \
+    ac_cv_func_fcntl=no \
+   $WGET_OVERRIDE \
+  || abort "[wget gnutls] configure failed"
+  make -j $CORE || abort "[wget gnutls] make failed"
+  locked make install || abort "[wget gnutls] make install"
+  mkdir -p "$INSTALL_PATH"/wget-gnutls
+  # From the build tree: bin/wget.exe is whichever variant was installed last
+  cp src/wget.exe "$INSTALL_PATH"/wget-gnutls/wget-gnutls$EXE_SUFFIX
+  $MINGW_STRIP_TOOL "$INSTALL_PATH"/wget-gnutls/wget-gnutls$EXE_SUFFIX
+  cd ../..
+fi
 # -----------------------------------------------------------------------------
 # Build wget (openssl)
 # -----------------------------------------------------------------------------
-cd ..
-rm -rf "wget-${WGET_VER}"
-tar -xf "$DOWNLOAD_DIR/wget-${WGET_VER}.tar.gz"
-cd "wget-${WGET_VER}"
-cp ../../windows-openssl.diff .
-patch src/openssl.c < windows-openssl.diff
-# Force fcntl to 'no' because MinGW headers lack POSIX constants like F_SETFD,
-# causing Gnulib's replacement wrapper (rpl_fcntl) to fail during compilation.
-env "${NANOSLEEP_OVERRIDES[@]}" \
-CFLAGS="-I$INSTALL_PATH/include -DCARES_STATICLIB=1 -DPCRE2_STATIC=1 -DNDEBUG -O2 -march=$WGET_ARCH -mtune=generic $WGET_CFLAGS" \
- LDFLAGS="-L$INSTALL_PATH/lib -static -static-libgcc" \
- CPPFLAGS="-DSYSTEM_WGETRC='\"C:/ProgramData/wget/etc/wgetrc\"' -DLOCALEDIR='\"C:/ProgramData/wget/share/locale\"'" \
- OPENSSL_CFLAGS=$CFLAGS \
- OPENSSL_LIBS="-L$INSTALL_PATH/$OPENSSL_LIB_DIR -lcrypto -lssl -lbcrypt" \
- LIBPSL_CFLAGS=$CFLAGS \
- LIBPSL_LIBS="-L$INSTALL_PATH/lib -lpsl" \
- CARES_CFLAGS=$CFLAGS \
- CARES_LIBS="-L$INSTALL_PATH/lib -lcares" \
- PCRE2_CFLAGS=$CFLAGS \
- PCRE2_LIBS="-L$INSTALL_PATH/lib -lpcre2-8"  \
- LIBS="-L$INSTALL_PATH/lib -L$INSTALL_PATH/$OPENSSL_LIB_DIR -lssl -lcrypto -lpsl -lidn2 -lunistring -liconv -lpcre2-8 -lgpg-error -lintl -lcares -lz -lws2_32 -lbcrypt -lcrypt32 -liphlpapi" \
- ./configure \
- --host=$WGET_MINGW_HOST \
- --prefix="$INSTALL_PATH" \
- --disable-debug \
- --disable-valgrind-tests \
- --enable-iri \
- --enable-pcre2 \
- --with-ssl=openssl \
- --with-included-libunistring \
- --with-libidn \
- --with-cares \
- --with-libpsl \
- --with-openssl \
-  ac_cv_func_fcntl=no \
-  $WGET_OVERRIDE \
-|| abort "[wget openssl] configure failed"
-make -j $CORE || abort "[wget openssl] make failed"
-make install || abort "[wget openssl] make install"
-mkdir -p "$INSTALL_PATH"/wget-openssl
-cp "$INSTALL_PATH"/bin/wget.exe "$INSTALL_PATH"/wget-openssl/wget-openssl$EXE_SUFFIX
-$MINGW_STRIP_TOOL "$INSTALL_PATH"/wget-openssl/wget-openssl$EXE_SUFFIX
+if run_stage wget-openssl; then
+  fetch_src "$WGET_URL"
+  rm -rf wget-openssl && mkdir wget-openssl
+  tar -xf "$DOWNLOAD_DIR/wget-${WGET_VER}.tar.gz" -C wget-openssl
+  cd "wget-openssl/wget-${WGET_VER}"
+  cp "$ROOT_DIR"/windows-openssl.diff .
+  patch src/openssl.c < windows-openssl.diff
+  # Force fcntl to 'no' because MinGW headers lack POSIX constants like F_SETFD,
+  # causing Gnulib's replacement wrapper (rpl_fcntl) to fail during compilation.
+  env "${NANOSLEEP_OVERRIDES[@]}" \
+  CFLAGS="-I$INSTALL_PATH/include -DCARES_STATICLIB=1 -DPCRE2_STATIC=1 -DNDEBUG -O2 -march=$WGET_ARCH -mtune=generic $WGET_CFLAGS" \
+   LDFLAGS="-L$INSTALL_PATH/lib -static -static-libgcc" \
+   CPPFLAGS="-DSYSTEM_WGETRC='\"C:/ProgramData/wget/etc/wgetrc\"' -DLOCALEDIR='\"C:/ProgramData/wget/share/locale\"'" \
+   OPENSSL_CFLAGS=$CFLAGS \
+   OPENSSL_LIBS="-L$INSTALL_PATH/$OPENSSL_LIB_DIR -lcrypto -lssl -lbcrypt" \
+   LIBPSL_CFLAGS=$CFLAGS \
+   LIBPSL_LIBS="-L$INSTALL_PATH/lib -lpsl" \
+   CARES_CFLAGS=$CFLAGS \
+   CARES_LIBS="-L$INSTALL_PATH/lib -lcares" \
+   PCRE2_CFLAGS=$CFLAGS \
+   PCRE2_LIBS="-L$INSTALL_PATH/lib -lpcre2-8"  \
+   LIBS="-L$INSTALL_PATH/lib -L$INSTALL_PATH/$OPENSSL_LIB_DIR -lssl -lcrypto -lpsl -lidn2 -lunistring -liconv -lpcre2-8 -lgpg-error -lintl -lcares -lz -lws2_32 -lbcrypt -lcrypt32 -liphlpapi" \
+   ./configure \
+   --host=$WGET_MINGW_HOST \
+   --prefix="$INSTALL_PATH" \
+   --disable-debug \
+   --disable-valgrind-tests \
+   --enable-iri \
+   --enable-pcre2 \
+   --with-ssl=openssl \
+   --with-included-libunistring \
+   --with-libidn \
+   --with-cares \
+   --with-libpsl \
+   --with-openssl \
+    ac_cv_func_fcntl=no \
+    $WGET_OVERRIDE \
+  || abort "[wget openssl] configure failed"
+  make -j $CORE || abort "[wget openssl] make failed"
+  locked make install || abort "[wget openssl] make install"
+  mkdir -p "$INSTALL_PATH"/wget-openssl
+  cp src/wget.exe "$INSTALL_PATH"/wget-openssl/wget-openssl$EXE_SUFFIX
+  $MINGW_STRIP_TOOL "$INSTALL_PATH"/wget-openssl/wget-openssl$EXE_SUFFIX
+  cd ../..
+fi
 cd "$ROOT_DIR" && exit 0
@@ -0,0 +1,427 @@
+"""
+Parallel driver for build.sh
+Usage: build_driver.py [--jobs N] [--cores N] [--json FILE] [x64] [x86] [arm64]
+
+build.sh builds its libraries one after another. This driver runs every stage
+of build.sh on its own (WGET_BUILD_STAGE=<stage> ./build.sh <arch>) and starts
+each one as soon as the stages it depends on are done, for all architectures at
+once. Each stage logs to build-wget-<arch>/logs/<stage>.log.
+
+A finished stage is stamped with a key over its build.sh block, the versions
+and patches it uses, the architecture setup and the keys of its dependencies,
+so a later run only rebuilds what a version or flag change affects; --no-cache
+rebuilds everything.
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_SCRIPT = os.path.join(ROOT_DIR, 'build.sh')
+ARCHS = ('x64', 'x86', 'arm64')
+
+# Stage -> stages it needs, every stage also needs 'fetch'. Only link
+# dependencies are listed: the stages that must not pick up libiconv, libintl
+# or libunistring from the shared install prefix are configured with
+# --without-lib*-prefix or their included copy, and the two wget variants
+# build in their own source directories.
+STAGE_DEPS = {
+    'fetch': [],
+    'gmp': [],
+    'nettle': ['gmp'],
+    'tasn1': [],
+    'idn2': [],
+    'unistring': [],
+    'zlib': [],
+    'gnutls': ['gmp', 'nettle', 'tasn1', 'idn2', 'zlib'],
+    'cares': [],
+    'iconv': [],
+    'psl': ['idn2', 'unistring', 'iconv'],
+    'pcre2': [],
+    'gpg-error': ['iconv'],
+    'gettext': ['iconv'],
+    'openssl': ['zlib'],
+    'wget-gnutls': ['gmp', 'nettle', 'tasn1', 'idn2', 'unistring', 'zlib', 'gnutls', 'cares', 'iconv',
+                    'psl', 'pcre2', 'gpg-error', 'gettext'],
+    'wget-openssl': ['idn2', 'unistring', 'zlib', 'cares', 'iconv', 'psl', 'pcre2', 'gpg-error', 'gettext',
+                     'openssl'],
+}
+
+
+def stage_deps(stage):
+    return STAGE_DEPS[stage] + (['fetch'] if stage != 'fetch' else [])
+
+
+def work_dir(arch):
+    return os.path.join(ROOT_DIR, f'build-wget-{arch}')
+
+
+class BuildScript:
+    """The stage blocks (`if run_stage <stage> ...; then` ... `fi`) of build.sh"""
+
+    def __init__(self, path=BUILD_SCRIPT):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        self.variables = dict(re.findall(r'^(\w+)="(.*)"$', text, re.MULTILINE))
+        self.stages = self.variables.get('BUILD_STAGES', '').split()
+
+        self.blocks = {}
+        for match in re.finditer(r'^if run_stage ([\w-]+)\b.*?^fi$', text, re.MULTILINE | re.DOTALL):
+            self.blocks[match.group(1)] = match.group(0)
+
+        # Everything before the first stage sets up the architectures and flags;
+        # package versions only count for the stages that use them
+        first = min((text.index(block) for block in self.blocks.values()), default=len(text))
+        packages = {name[:-len('_VER')] for name in self.variables if name.endswith('_VER')}
+        self.setup = ''.join(line for line in text[:first].splitlines(True)
+                             if not line.lstrip().startswith('#') and not self._package_line(line, packages))
+
+    @staticmethod
+    def _package_line(line, packages):
+        match = re.match(r'(\w+)_(?:VER|URL)=', line)
+        return match is not None and match.group(1) in packages
+
+    def inputs(self, stage):
+        """Versions, URLs and patch files a stage block refers to"""
+        block = self.blocks[stage]
+        names = sorted(set(re.findall(r'\$\{?(\w+_(?:VER|URL))\b', block)))
+        patches = {}
+        for name in sorted(set(re.findall(r'[\w.-]+\.(?:diff|patch)\b', block))):
+            path = os.path.join(ROOT_DIR, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    patches[name] = hashlib.sha256(f.read()).hexdigest()
+        return {'variables': {name: self.variables.get(name) for name in names}, 'patches': patches}
+
+
+class StageCache:
+    """Keys of finished stages, stamped in build-wget-<arch>/.stages/"""
+
+    def __init__(self, script, variant=None):
+        self.script = script
+        self.variant = variant
+        self._keys = {}
+
+    def key(self, arch, stage):
+        if (arch, stage) not in self._keys:
+            material = {
+                'arch': arch,
+                'variant': self.variant,
+                'stage': stage,
+                'setup': hashlib.sha256(self.script.setup.encode('utf-8')).hexdigest(),
+                'block': self.script.blocks[stage],
+                'inputs': self.script.inputs(stage),
+                # Not 'fetch', whose block names every version
+                'deps': {dep: self.key(arch, dep) for dep in STAGE_DEPS[stage]},
+            }
+            self._keys[arch, stage] = hashlib.sha256(
+                json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+        return self._keys[arch, stage]
+
+    def stamp_path(self, arch, stage):
+        return os.path.join(work_dir(arch), '.stages', f'{stage}.key')
+
+    def hit(self, arch, stage):
+        # Downloads are checked on every run, they are cheap when cached
+        if stage == 'fetch':
+            return False
+        try:
+            with open(self.stamp_path(arch, stage), encoding='utf-8') as f:
+                return f.read().strip() == self.key(arch, stage)
+        except OSError:
+            return False
+
+    def store(self, arch, stage):
+        path = self.stamp_path(arch, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.key(arch, stage) + '\n')
+
+
+def build_graph(archs, stages):
+    """{(arch, stage): set of (arch, stage) it waits for} for the stages and their dependencies"""
+    wanted = set()
+    todo = list(stages)
+    while todo:
+        stage = todo.pop()
+        if stage not in wanted:
+            wanted.add(stage)
+            todo.extend(stage_deps(stage))
+
+    graph = {}
+    for i, arch in enumerate(archs):
+        for stage in STAGE_DEPS:
+            if stage in wanted:
+                graph[arch, stage] = {(arch, dep) for dep in stage_deps(stage)}
+        # One download at a time into the shared build-wget-dl
+        if i and 'fetch' in wanted:
+            graph[arch, 'fetch'].add((archs[i - 1], 'fetch'))
+    return graph
+
+
+def chain_lengths(graph):
+    """Stages on the longest chain of dependents of each node, itself included"""
+    dependents = {node: [] for node in graph}
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(node)
+    lengths = {}
+
+    def length(node):
+        if node not in lengths:
+            lengths[node] = 1 + max((length(dependent) for dependent in dependents[node]), default=0)
+        return lengths[node]
+
+    for node in graph:
+        length(node)
+    return lengths
+
+
+def format_duration(seconds):
+    return f'{int(seconds // 60)}m{int(seconds % 60):02d}s' if seconds >= 60 else f'{seconds:.1f}s'
+
+
+class StageRunner:
+    """Runs single stages of build.sh, keeping track of the processes for Ctrl-C"""
+
+    def __init__(self, variant=None):
+        self.variant = variant
+        self.processes = set()
+        self.lock = threading.Lock()
+
+    def log_path(self, arch, stage):
+        return os.path.join(work_dir(arch), 'logs', f'{stage}.log')
+
+    def run(self, arch, stage, cores):
+        """Run one stage; returns (rc, start, duration)
+
+        WGET_BUILD_FORCE makes build.sh rebuild a library that is installed
+        already: the stage cache, not the library file, decides what is stale.
+        """
+        log_path = self.log_path(arch, stage)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        env = dict(os.environ, WGET_BUILD_STAGE=stage, WGET_BUILD_FORCE='1', CORE=str(cores))
+        cmd = ['bash', BUILD_SCRIPT, arch] + ([self.variant] if self.variant else [])
+
+        start = time.time()
+        with open(log_path, 'w', encoding='utf-8') as log:
+            log.write(f"# WGET_BUILD_STAGE={stage} WGET_BUILD_FORCE=1 CORE={cores} {' '.join(cmd)}\n")
+            log.flush()
+            proc = subprocess.Popen(cmd, cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL)
+            with self.lock:
+                self.processes.add(proc)
+            try:
+                rc = proc.wait()
+            finally:
+                with self.lock:
+                    self.processes.discard(proc)
+            duration = time.time() - start
+            log.write(f"# rc {rc} after {duration:.1f}s\n")
+        return rc, start, duration
+
+    def terminate(self):
+        with self.lock:
+            for proc in self.processes:
+                proc.terminate()
+
+
+def tail(path, lines=20):
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return f.readlines()[-lines:]
+    except OSError:
+        return []
+
+
+def run_build(graph, cache, runner, jobs, cores, use_cache=True):
+    """Run the graph on `jobs` workers; returns {(arch, stage): result}"""
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    results = {}
+    running = {}
+    # Long chains first, so that the critical path is never queued behind leaves
+    priority = chain_lengths(graph)
+
+    def finish(node):
+        del remaining[node]
+        for deps in remaining.values():
+            deps.discard(node)
+
+    def launch_ready(pool):
+        # Cache hits can make further stages ready, so look again until none do
+        hits = True
+        while hits:
+            ready = sorted((node for node, deps in remaining.items() if not deps and node not in results),
+                           key=lambda node: (-priority[node], node))
+            hits = [node for node in ready if use_cache and cache.hit(*node)]
+            for node in hits:
+                print(f"♻️  {node[0]}/{node[1]} cached")
+                results[node] = {'arch': node[0], 'stage': node[1], 'status': 'cached', 'duration': 0.0}
+                finish(node)
+
+        # Split the cores among the stages that will run alongside
+        share = min(jobs, len(running) + len(ready))
+        for node in ready[:jobs - len(running)]:
+            arch, stage = node
+            stage_cores = max(1, cores // share)
+            print(f"▶️  {arch}/{stage} (make -j {stage_cores})")
+            running[pool.submit(runner.run, arch, stage, stage_cores)] = node
+            results[node] = {'arch': arch, 'stage': stage, 'status': 'running', 'cores': stage_cores,
+                             'log': os.path.relpath(runner.log_path(arch, stage), ROOT_DIR)}
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            while remaining:
+                if not failed:
+                    launch_ready(pool)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    arch, stage = node
+                    rc, start, duration = future.result()
+                    result = results[node]
+                    result.update(start=start, duration=duration, rc=rc)
+                    if rc == 0:
+                        result['status'] = 'built'
+                        if stage != 'fetch':
+                            cache.store(arch, stage)
+                        print(f"✅ {arch}/{stage} {format_duration(duration)}")
+                        finish(node)
+                    else:
+                        # Let the running stages finish, but start no new ones
+                        result['status'] = 'failed'
+                        failed = True
+                        print(f"❌ {arch}/{stage} failed after {format_duration(duration)} (rc {rc}), "
+                              f"log: {result['log']}")
+                        for line in tail(runner.log_path(arch, stage)):
+                            print(f"   {line.rstrip()}")
+        except KeyboardInterrupt:
+            runner.terminate()
+            raise
+
+    for node in remaining:
+        results.setdefault(node, {'arch': node[0], 'stage': node[1], 'status': 'skipped', 'duration': 0.0})
+    return results
+
+
+def print_plan(graph, cache, use_cache=True):
+    """Print the stages wave by wave, as they could run with unlimited jobs"""
+    remaining = {node: set(deps) for node, deps in graph.items()}
+    wave = 1
+    while remaining:
+        ready = sorted(node for node, deps in remaining.items() if not deps)
+        labels = [f"{arch}/{stage}" + (" (cached)" if use_cache and cache.hit(arch, stage) else "")
+                  for arch, stage in ready]
+        print(f"  {wave:>2}: {', '.join(labels)}")
+        for node in ready:
+            del remaining[node]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+        wave += 1
+
+
+def print_summary(results, wall_time):
+    print("\n" + "=" * 60)
+    print("Build Summary")
+    print("=" * 60)
+    built = [r for r in results if r['status'] == 'built']
+    for status in ('built', 'cached', 'failed', 'skipped'):
+        count = sum(1 for r in results if r['status'] == status)
+        if count:
+            print(f"{status.capitalize()}: {count}")
+    stage_time = sum(r['duration'] for r in built)
+    if built:
+        print(f"Stage time {format_duration(stage_time)} in {format_duration(wall_time)} wall "
+              f"({stage_time / wall_time:.1f}x)")
+        print("Slowest stages:")
+        for r in sorted(built, key=lambda r: r['duration'], reverse=True)[:5]:
+            print(f"  {r['arch']}/{r['stage']}: {format_duration(r['duration'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='build_driver.py',
+        description='Run the stages of build.sh concurrently along their dependencies, '
+                    'for several architectures at once')
+    parser.add_argument('archs', nargs='*', choices=ARCHS, metavar='arch',
+                        help='architectures to build: x64, x86, arm64 (default: x64 x86, as build.sh)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='stages to run at the same time (default: number of CPUs)')
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1,
+                        help='make -j budget shared by the running stages (default: number of CPUs)')
+    parser.add_argument('--stages', type=lambda v: v.split(','), default=list(STAGE_DEPS),
+                        help='comma separated stages to build, with their dependencies (default: all)')
+    parser.add_argument('--mingw13', action='store_true', help='pass the mingw13 workarounds to build.sh')
+    parser.add_argument('--no-cache', action='store_true', help='rebuild stages whose stamp is up to date')
+    parser.add_argument('--dry-run', action='store_true', help='print the stages in dependency order and exit')
+    parser.add_argument('--json', metavar='FILE', help='write per-stage timings as JSON')
+    args = parser.parse_args()
+    archs = list(dict.fromkeys(args.archs)) or ['x64', 'x86']
+    if args.jobs < 1 or args.cores < 1:
+        parser.error('--jobs and --cores must be at least 1')
+    for stage in args.stages:
+        if stage not in STAGE_DEPS:
+            parser.error(f"unknown stage '{stage}' (choose from {', '.join(STAGE_DEPS)})")
+
+    script = BuildScript()
+    if set(script.stages) != set(STAGE_DEPS) or set(script.blocks) != set(STAGE_DEPS):
+        print(f"❌ build.sh stages ({', '.join(script.stages)}) do not match the dependency graph "
+              f"({', '.join(STAGE_DEPS)})")
+        sys.exit(2)
+
+    variant = 'mingw13' if args.mingw13 else None
+    cache = StageCache(script, variant)
+    graph = build_graph(archs, args.stages)
+
+    print("=" * 60)
+    print(f"Wget Build ({', '.join(archs)}: {len(graph)} stages, {args.jobs} jobs, {args.cores} cores)")
+    print("=" * 60)
+    if args.dry_run:
+        print_plan(graph, cache, not args.no_cache)
+        sys.exit(0)
+
+    start = time.time()
+    try:
+        results = list(run_build(graph, cache, StageRunner(variant), args.jobs, args.cores,
+                                 not args.no_cache).values())
+    except KeyboardInterrupt:
+        print("\n❌ Interrupted")
+        sys.exit(130)
+    wall_time = time.time() - start
+    print_summary(results, wall_time)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'kind': 'build',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'archs': archs,
+                'jobs': args.jobs,
+                'cores': args.cores,
+                'wall_time': wall_time,
+                'stages': results,
+            }, f, indent=2)
+        print(f"📄 JSON report written to {args.json}")
+
+    ok = all(r['status'] in ('built', 'cached') for r in results)
+    print("=" * 60)
+    print("✅ Build finished" if ok else "❌ Build failed")
+    print("=" * 60)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()